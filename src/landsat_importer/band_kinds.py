@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+#     landsat_importer
+#     Copyright (C) 2023  National Centre for Earth Observation (NCEO)
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from enum import Enum
+
+class BandKinds(Enum):
+    """Define how the pixel values of a band are decoded"""
+
+    LEVEL2 = "level2"
+    REFLECTANCE = "reflectance"
+    CORRECTED_REFLECTANCE = "corrected_reflectance"
+    BT = "bt"
+    RADIANCE = "radiance"
+    ANGLE = "angle"
+    OTHER = "other"
+
+    def __str__(self):
+        return self.value
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+#     landsat_importer
+#     Copyright (C) 2023  National Centre for Earth Observation (NCEO)
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""helpers for sizing the thread pools used when processing a scene"""
+
+import os
+
+def available_cpus():
+    """
+    Get the number of CPUs this process may run on
+
+    Under a batch scheduler such as slurm this is the CPUs allocated to the job (the process's
+    affinity mask) rather than all the CPUs of the node
+
+    Returns:
+        the number of usable CPUs, at least 1
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+#     landsat_importer
+#     Copyright (C) 2023  National Centre for Earth Observation (NCEO)
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""routines for computing the latitude and longitude of projected grid points"""
+
+import concurrent.futures
+import functools
+
+import numpy as np
+from pyproj import Transformer
+
+from landsat_importer.concurrency import available_cpus
+
+# approximate number of grid points passed to PROJ at a time when computing lat/lon
+# (large enough to amortise the per-call overhead, small enough to keep the float64 buffers modest)
+LATLON_BLOCK_POINTS = 1000000
+
+# the maximum number of threads transforming lat/lon concurrently, each holds a pair of float64 block buffers
+# (16MB at the default block size), keeping the total well within the memory limit of a batch job
+LATLON_MAX_WORKERS = 4
+
+@functools.lru_cache(maxsize=32)
+def cached_transformer(src_crs, dst_crs, always_xy=True):
+    """
+    Get a pyproj Transformer, reusing an existing instance for the same CRS pair
+
+    Building a transformer is expensive relative to using it, and scenes processed in a batch
+    tend to share a small number of projections
+    """
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=always_xy)
+
+def latlon_grid(x, y, src_crs, dtype=np.float32):
+    """
+    Compute the latitude and longitude of every point of a projected grid
+
+    The rows of the grid are split into contiguous ranges which are transformed concurrently
+    (PROJ releases the GIL while transforming).  Each range is transformed in blocks of rows,
+    in place in a pair of float64 buffers reused for every block of the range, so that
+    full size meshgrid copies of the x and y coordinates are never built.
+
+    Args:
+        x: 1-D array of the grid's x coordinates
+        y: 1-D array of the grid's y coordinates
+        src_crs: the CRS of the grid
+        dtype: the type of the returned arrays
+
+    Returns:
+        tuple (lat, lon) of 2-D arrays with shape (len(y), len(x))
+    """
+    transformer = cached_transformer(src_crs, "EPSG:4326")
+    x1 = np.asarray(x, dtype=np.float64)
+    y1 = np.asarray(y, dtype=np.float64)
+    (ny, nx) = (y1.size, x1.size)
+    lat = np.empty((ny, nx), dtype=dtype)
+    lon = np.empty((ny, nx), dtype=dtype)
+    block_rows = max(1, LATLON_BLOCK_POINTS // max(nx, 1))
+
+    nblocks = (ny + block_rows - 1) // block_rows
+    workers = max(1, min(nblocks, available_cpus(), LATLON_MAX_WORKERS))
+    # split the blocks as evenly as possible into one contiguous range of rows per worker
+    range_starts = [(nblocks * w // workers) * block_rows for w in range(workers)] + [ny]
+
+    def transform_range(w):
+        (start, end) = (range_starts[w], min(range_starts[w+1], ny))
+        x_buffer = np.empty((min(block_rows, end - start), nx), dtype=np.float64)
+        y_buffer = np.empty_like(x_buffer)
+        for j in range(start, end, block_rows):
+            rows = min(block_rows, end - j)
+            xb = x_buffer[:rows]
+            yb = y_buffer[:rows]
+            xb[...] = x1[None, :]
+            yb[...] = y1[j:j+rows, None]
+            # with always_xy, x is replaced by longitude and y by latitude
+            transformer.transform(xb, yb, inplace=True)
+            # each range writes a disjoint set of rows
+            lon[j:j+rows] = xb
+            lat[j:j+rows] = yb
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # consume the results so that any exception is raised here
+        list(executor.map(transform_range, range(workers)))
+    return lat, lon
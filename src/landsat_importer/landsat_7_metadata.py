@@ -117,6 +117,9 @@ def get_cloud_shadow_confidence():
 
 
 class Landsat7Metadata(LandsatMetadata):
+
+    __slots__ = ()
+
     # https://www.usgs.gov/media/files/landsat-8-data-users-handbook P55
 
     # https://d9-wret.s3.us-west-2.amazonaws.com/assets/palladium/production/s3fs-public/media/files/LSDS-1337_Landsat7ETM-C2-L2-DFCB-v6.pdf
@@ -290,14 +293,6 @@ class Landsat7Metadata(LandsatMetadata):
                 self.comments[band] = oli_comment
 
 
-    def get_solar_angles(self):
-        root = "LANDSAT_METADATA_FILE/IMAGE_ATTRIBUTES"
-
-        elev = self[root+"/SUN_ELEVATION"]
-        azim = self[root+"/SUN_AZIMUTH"]
-        dist = self[root+"/EARTH_SUN_DISTANCE"]
-        return 90-float(elev), float(azim), float(dist)
-
     def get_reflectance_correction(self,band):
         # return (add,mult,sun_elevation)
         l7_band = band_mapping.get(band,"")
@@ -315,11 +310,6 @@ class Landsat7Metadata(LandsatMetadata):
         else:
             return (float(add), float(mult), float(sun_elevation))
 
-    def get_angle_correction(self):
-        # return multiplying factor to convert angle band data to degrees
-        # angles are encoded as hundredths of a degree
-        return 0.01
-
     def get_radiance_correction(self,band):
         # return (add,mult)
         l7_band = band_mapping.get(band, "")
@@ -346,24 +336,6 @@ class Landsat7Metadata(LandsatMetadata):
         else:
             return (float(k1),float(k2))
 
-    def get_thermal_lines_samples(self):
-        root = "LANDSAT_METADATA_FILE/PROJECTION_ATTRIBUTES"
-        thermal_lines = self[root + "/THERMAL_LINES"]
-        thermal_samples = self[root + "/THERMAL_SAMPLES"]
-        return (int(thermal_lines), int(thermal_samples))
-
-    def get_extent(self,is_lat):
-        # order "UL", "UR", "LL", "LR"
-        root = "LANDSAT_METADATA_FILE/PROJECTION_ATTRIBUTES"
-        lat_or_lon = "LAT" if is_lat else "LON"
-        ul = self[root + "/CORNER_UL_%s_PRODUCT" % lat_or_lon]
-        ur = self[root + "/CORNER_UR_%s_PRODUCT" % lat_or_lon]
-        ll = self[root + "/CORNER_LL_%s_PRODUCT" % lat_or_lon]
-        lr = self[root + "/CORNER_LR_%s_PRODUCT" % lat_or_lon]
-        if ul is None or ur is None or ll is None or lr is None:
-            raise Exception("get_lat_extent")
-        return [float(ul),float(ur),float(ll),float(lr)]
-
     def get_level2_shift(self,band):
         # https://www.usgs.gov/media/files/landsat-8-collection-2-level-2-science-product-guide
         if band == "ST":
@@ -401,51 +373,12 @@ class Landsat7Metadata(LandsatMetadata):
             raise Exception("get_surface_temperature_correction")
         return [float(add),float(mult)]
 
-    def get_sensor_id(self):
-        return self.sensor_id
-
-    def get_landsat(self):
-        return self.landsat
-
-    def get_name(self,band):
-        return self.names.get(band,band)
-
-    def get_units(self,band):
-        return self.units.get(band,"Unitless")
-
-    def get_standard_name(self,band):
-        return self.standard_names.get(band,"")
-
-    def get_long_name(self,band):
-        return self.long_names.get(band,"")
-
-    def get_comment(self,band):
-        return self.comments.get(band,"")
-
-    def get_spacecraft_id(self):
-        return self.spacecraft_id
-
-    def get_processing_level(self):
-        return self.processing_level
-
-    def get_acquisition_timestamp(self):
-        return self.acquisition_timestamp
-
-    def has_band(self,band):
-        return band in self.available_bands
-
-    def get_bands(self):
-        return self.available_bands
-
     def get_band_suffixes(self):
         if self.level == 1:
             return suffixes_l1
         else:
             return suffixes_l2
 
-    def get_collection(self):
-        return self.collection
-
     def get_pixel_filter(self, cloud_filter, cloud_shadow_filter, cirrus_filter=None):
 
         if not cloud_filter and not cloud_shadow_filter:
@@ -474,11 +407,5 @@ class Landsat7Metadata(LandsatMetadata):
 
         return filter_function
 
-    def get_qa_band(self):
-        return "QA_PIXEL"
-
     def get_qa_flag_metadata(self):
         return zip(*Landsat7Metadata.L1C2_QA)
-
-    def __repr__(self):
-        return self.spacecraft_id + ":" + self.processing_level
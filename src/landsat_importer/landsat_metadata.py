@@ -1,8 +1,33 @@
 import os
+import re
+from dataclasses import dataclass
 from .oli_formats import OLIFormats
+from .band_kinds import BandKinds
+
+
+@dataclass(slots=True, frozen=True)
+class BandInfo:
+    """Describe how an input band maps to its output variable"""
+
+    band: str  # the name of the band in the input data
+    name: str  # the name of the output variable
+    long_name: str
+    standard_name: str
+    units: str
+    comment: str
+    is_integer: bool
+    kind: BandKinds  # how the band's pixel values are decoded
+
 
 class LandsatMetadata:
 
+    # attributes are fixed, avoid a per-instance __dict__
+    # the scene attributes are assigned by the spacecraft specific subclasses
+    __slots__ = ("metadata", "path", "oli_format", "logger",
+                 "landsat", "sensor_id", "spacecraft_id", "collection", "processing_level", "level",
+                 "product_id", "scene_id", "acquisition_timestamp",
+                 "available_bands", "comments", "names", "standard_names", "long_names", "units")
+
     def __init__(self, metadata, path, oli_format):
         self.metadata = metadata
         self.path = path
@@ -30,24 +55,26 @@ class LandsatMetadata:
 
         Returns:
             dict: mapping from band name to the path of its file
-
-        Raises:
-             Exception if multiple matches exist for a given band
         """
         splits = os.path.split(self.path)
         folder = splits[0]
         metadata_filename = splits[1]
         stem = metadata_filename[:metadata_filename.lower().find("_mtl")] # remove training _MTL*, get a stem which all scene files should match
 
-        files = sorted(os.listdir(folder))
+        # bands with an empty suffix have no equivalent file for this product
+        suffix_to_band = {band_suffixes[band]: band for band in bands if band_suffixes[band]}
+        if not suffix_to_band:
+            return {}
+
+        # match each filename against all suffixes in a single pass, the matched suffix identifies the band
+        pattern = re.compile("^" + re.escape(stem) + "_(" + "|".join(re.escape(s) for s in suffix_to_band) + ")$")
+
         band_paths = {}
-        for file in files:
-            for band in bands:
-                suffix = band_suffixes[band]
-                if file.startswith(stem) and file.endswith(suffix):
-                    if band in band_paths:
-                        self.logger.warning("Found multiple TIF files with same suffix %s for band %s, ignoring %s"% (suffix,band,file))
-                    band_paths[band] = os.path.join(folder, file)
+        with os.scandir(folder or ".") as it:
+            for entry in it:
+                m = pattern.match(entry.name)
+                if m:
+                    band_paths[suffix_to_band[m.group(1)]] = os.path.join(folder, entry.name)
         return band_paths
 
     def is_bt(self, band):
@@ -71,6 +98,133 @@ class LandsatMetadata:
     def is_level2(self, band):
         return band in ["ST", "ST_QA", "EMIS", "EMSD", "TRAD", "URAD", "DRAD", "ATRAN"]
 
+    def get_band_kind(self, band):
+        """
+        classify a band according to how its pixel values are decoded
+
+        Args:
+            band: the name of the band
+
+        Returns:
+            a BandKinds value
+        """
+        if self.is_level2(band):
+            return BandKinds.LEVEL2
+        if self.is_reflectance(band):
+            return BandKinds.REFLECTANCE
+        if self.is_corrected_reflectance(band):
+            return BandKinds.CORRECTED_REFLECTANCE
+        if self.is_bt(band):
+            return BandKinds.BT
+        if self.is_radiance(band):
+            return BandKinds.RADIANCE
+        if self.is_angle(band):
+            return BandKinds.ANGLE
+        return BandKinds.OTHER
+
+    def get_solar_angles(self):
+        root = "LANDSAT_METADATA_FILE/IMAGE_ATTRIBUTES"
+
+        elev = self[root+"/SUN_ELEVATION"]
+        azim = self[root+"/SUN_AZIMUTH"]
+        dist = self[root+"/EARTH_SUN_DISTANCE"]
+        return 90-float(elev), float(azim), float(dist)
+
+    def get_angle_correction(self):
+        # return multiplying factor to convert angle band data to degrees
+        # angles are encoded as hundredths of a degree
+        return 0.01
+
+    def get_thermal_lines_samples(self):
+        root = "LANDSAT_METADATA_FILE/PROJECTION_ATTRIBUTES"
+        thermal_lines = self[root + "/THERMAL_LINES"]
+        thermal_samples = self[root + "/THERMAL_SAMPLES"]
+        return (int(thermal_lines), int(thermal_samples))
+
+    def get_extent(self,is_lat):
+        # order "UL", "UR", "LL", "LR"
+        root = "LANDSAT_METADATA_FILE/PROJECTION_ATTRIBUTES"
+        lat_or_lon = "LAT" if is_lat else "LON"
+        ul = self[root + "/CORNER_UL_%s_PRODUCT" % lat_or_lon]
+        ur = self[root + "/CORNER_UR_%s_PRODUCT" % lat_or_lon]
+        ll = self[root + "/CORNER_LL_%s_PRODUCT" % lat_or_lon]
+        lr = self[root + "/CORNER_LR_%s_PRODUCT" % lat_or_lon]
+        if ul is None or ur is None or ll is None or lr is None:
+            raise Exception("get_lat_extent")
+        return [float(ul),float(ur),float(ll),float(lr)]
+
+    def get_sensor_id(self):
+        return self.sensor_id
+
+    def get_landsat(self):
+        return self.landsat
+
+    def get_name(self,band):
+        return self.names.get(band,band)
+
+    def get_units(self,band):
+        return self.units.get(band,"Unitless")
+
+    def get_standard_name(self,band):
+        return self.standard_names.get(band,"")
+
+    def get_long_name(self,band):
+        return self.long_names.get(band,"")
+
+    def get_comment(self,band):
+        return self.comments.get(band,"")
+
+    def get_spacecraft_id(self):
+        return self.spacecraft_id
+
+    def get_processing_level(self):
+        return self.processing_level
+
+    def get_acquisition_timestamp(self):
+        return self.acquisition_timestamp
+
+    def has_band(self,band):
+        return band in self.available_bands
+
+    def get_bands(self):
+        return self.available_bands
+
+    def get_collection(self):
+        return self.collection
+
+    def get_qa_band(self):
+        return "QA_PIXEL"
+
+    def get_band_info(self, band):
+        """
+        get the output variable description for a band
+
+        Args:
+            band: the name of the band
+
+        Returns:
+            a BandInfo object
+        """
+        return BandInfo(band=band, name=self.get_name(band), long_name=self.get_long_name(band),
+                        standard_name=self.get_standard_name(band), units=self.get_units(band),
+                        comment=self.get_comment(band), is_integer=self.is_integer(band),
+                        kind=self.get_band_kind(band))
+
+    def get_band_info_bulk(self, bands):
+        """
+        get the output variable descriptions for a list of bands
+
+        Args:
+            bands: a list of band names
+
+        Returns:
+            a list of BandInfo objects, in the same order as bands
+        """
+        return [self.get_band_info(band) for band in bands]
+
+    def __repr__(self):
+        return self.spacecraft_id + ":" + self.processing_level
+
     def __getitem__(self, keys):
         """
         keys may be supplied as a tuple or '/' separated string e.g.
@@ -109,7 +263,7 @@ class LandsatMetadata:
         return m
 
     def __contains__(self, key):
-        if self[key]:
-            return True
+        # __getitem__ returns a reference to the matching node and stops at the first missing key
+        return bool(self[key])
 
 
@@ -1,6 +1,6 @@
 import os
 
-import xml.dom.minidom
+from xml.etree import ElementTree
 import json
 
 from landsat_importer.landsat_7_metadata import Landsat7Metadata
@@ -48,25 +48,22 @@ class LandsatMetadataFactory:
 
     @staticmethod
     def read_metadata_xml(path):
+        """Read Landsat metadata from XML format _MTL.xml file"""
         metadata = {}
-        with open(path) as file:
-            doc = xml.dom.minidom.parseString(file.read())
-
-            def parse(ele):
-                value = {}
-                text = ""
-                for child in ele.childNodes:
-                    if child.nodeType == child.ELEMENT_NODE:
-                        value[child.tagName] = parse(child)
-                    elif child.nodeType == child.TEXT_NODE:
-                        text += child.nodeValue
-                if len(value):
-                    return value
+        # stream through the document, elements with child elements map to a dict, others to their text
+        groups = []
+        for (event, ele) in ElementTree.iterparse(path, events=("start", "end")):
+            if event == "start":
+                groups.append({})
+            else:
+                children = groups.pop()
+                value = children if len(children) else (ele.text or "")
+                if groups:
+                    groups[-1][ele.tag] = value
                 else:
-                    return text
-
-            v = parse(doc.documentElement)
-            metadata[doc.documentElement.tagName] = v
+                    metadata[ele.tag] = value
+                # release the parsed element as it is no longer needed
+                ele.clear()
         return metadata
 
     @staticmethod
@@ -16,10 +16,17 @@
 #     You should have received a copy of the GNU General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import argparse
+import csv
 import logging
+import os.path
 import random
 import json
 
+from .oli_formats import OLIFormats
+from landsat_importer.processor import Processor
+from landsat_importer.netcdf4_exporter import COMPRESSION_ENCODINGS
+
 available = False
 try:
     from pyjob import use
@@ -43,10 +50,6 @@ def main():
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("main")
 
-    import argparse
-    import os.path
-    from .oli_formats import OLIFormats
-
     parser = argparse.ArgumentParser()
 
     parser.add_argument("input_path",help="Specify the path to the input landsat scene, may be a folder or metadata filename")
@@ -70,6 +73,20 @@ def main():
         help="include angle data in the export"
     )
 
+    parser.add_argument(
+        "--compression",
+        default="zlib",
+        choices=list(COMPRESSION_ENCODINGS),
+        help="compression to apply to the exported variables"
+    )
+
+    parser.add_argument(
+        "--least-significant-digit",
+        type=int,
+        default=None,
+        help="quantize floating point bands to this many decimal places before compression (lossy)"
+    )
+
     parser.add_argument(
         "--output-file-pattern",
         metavar="<FILE-PATTERN>",
@@ -95,19 +112,18 @@ def main():
     if args.use_slurm:
         slurm_options = {k: v for (k, v) in slurm_defaults.items()}
 
-    from landsat_importer.processor import Processor
     input_paths = []
     if args.input_path.endswith(".csv"):
-        import csv
         with open(args.input_path) as f:
             r = csv.reader(f)
             for line in r:
                 input_paths.append(line[0])
 
     elif os.path.isdir(args.input_path):
-        for filename in sorted(os.listdir(args.input_path)):
-            if filename.lower().endswith("mtl.xml"):
-                input_paths.append(os.path.join(args.input_path,filename))
+        with os.scandir(args.input_path) as it:
+            input_paths = [entry.path for entry in it if entry.name.lower().endswith("mtl.xml")]
+        # scandir order depends on the filesystem, sort so that the seeded shuffle below is reproducible
+        input_paths.sort()
     else:
         input_paths = [args.input_path]
 
@@ -121,6 +137,8 @@ def main():
     limit = args.limit
     batch = args.batch
 
+    existing_outputs = {} # map from output folder to the set of filenames it contains
+
     for input_path in input_paths:
         if offset is not None and idx < offset:
             idx += 1
@@ -151,6 +169,9 @@ def main():
                 s = "".join(args.inject_metadata)
                 script_contents += f" --inject-metadata {s}"
             script_contents += f" --export_oli_as {args.export_oli_as}"
+            script_contents += f" --compression {args.compression}"
+            if args.least_significant_digit is not None:
+                script_contents += f" --least-significant-digit {args.least_significant_digit}"
             script_contents += f" --output-file-pattern \"{args.output_file_pattern}\"\n"
             job = pyjob.Job('hostname', script=script_contents, options=slurm_options, env="/bin/bash")
             task_id = pyjob.cluster.submit(job)
@@ -169,7 +190,15 @@ def main():
                     output_file_path = os.path.join(output_path,p.get_output_filename(args.output_file_pattern))
                 else:
                     output_file_path = output_path
-                if os.path.exists(output_file_path):
+                # list each output folder once rather than checking every output file separately
+                (output_folder, output_filename) = os.path.split(output_file_path)
+                if output_folder not in existing_outputs:
+                    if os.path.isdir(output_folder or "."):
+                        with os.scandir(output_folder or ".") as it:
+                            existing_outputs[output_folder] = set(entry.name for entry in it)
+                    else:
+                        existing_outputs[output_folder] = set()
+                if output_filename in existing_outputs[output_folder]:
                     logger.info(f"Output path {output_file_path} already exists, skipping")
                     continue
                 inject_metadata = {}
@@ -179,7 +208,9 @@ def main():
                         inject_metadata[kv[0]] = kv[1]
                 p.process(target_bands)
                 p.export(output_file_path, include_angles=args.include_angles, min_lat=args.min_lat, min_lon=args.min_lon,
-                         max_lat=args.max_lat, max_lon=args.max_lon, inject_metadata=inject_metadata)
+                         max_lat=args.max_lat, max_lon=args.max_lon, inject_metadata=inject_metadata,
+                         compression=args.compression, least_significant_digit=args.least_significant_digit)
+                existing_outputs[output_folder].add(output_filename)
             except Exception as ex:
                 logger.exception(f"Processing failed for {input_path}: "+str(ex))
                 if len(input_paths) == 1:
@@ -26,13 +26,31 @@ import logging
 
 import netCDF4
 import xarray as xr
-from pyproj import Transformer
 import numpy as np
 
 from landsat_importer import VERSION as LANDSAT_IMPORTER_VERSION
+from landsat_importer.geolocation import cached_transformer, latlon_grid
+from landsat_importer.tiff_importer import INTEGER_FILL_VALUE
 # YYYY-MM-DDThh:mm:ss<tz>
 DATEFORMAT = "%Y-%m-%dT%H:%M:%S%z"
 
+# netcdf4 encoding settings for each supported compression option
+# (the pinned xarray 2023.3 only forwards zlib to netCDF4, other filters such as zstd would be silently dropped)
+COMPRESSION_ENCODINGS = {
+    "none": {},
+    "zlib": {'zlib': True, 'complevel': 5}
+}
+
+# maximum chunk length along each dimension of the exported variables
+# (512x512 chunks of 4 byte values are 1MB before compression)
+EXPORT_CHUNK_SIZE = 512
+
+# the user running the export, recorded as creator_name
+try:
+    USERNAME = getpass.getuser()
+except Exception:
+    USERNAME = "?"
+
 def date_format(dt):
     if dt is None:
         return None
@@ -43,24 +61,73 @@ def date_parse(s):
         return None
     return datetime.datetime.strptime(s,DATEFORMAT)
 
+def chunk_shape(variable):
+    """get the chunk sizes to use when exporting a variable"""
+    return tuple(min(EXPORT_CHUNK_SIZE, n) for n in variable.shape)
 
 class Netcdf4Exporter:
 
     """Handle the export of regridded landsat data to netcdf4 and PNG"""
 
-    def __init__(self, landsat_metadata, inject_metadata):
+    def __init__(self, landsat_metadata, inject_metadata, compression="zlib", least_significant_digit=None):
         """
         Construct an exporter instance
 
         Args:
             landsat_metadata: a LandsatMetadata object
             inject_metadata: dictionary to supply additional global metadata to add to exported file
+            compression: the compression to apply to exported variables, a key of COMPRESSION_ENCODINGS
+            least_significant_digit: if not None, quantize floating point bands to this many decimal places
+                                     before compression (lossy, but compresses much better)
         """
         self.landsat_metadata = landsat_metadata
         self.inject_metadata = inject_metadata
+        if compression not in COMPRESSION_ENCODINGS:
+            raise Exception("Unsupported compression %s" % compression)
+        self.compression = compression
+        self.least_significant_digit = least_significant_digit
         self.logger = logging.getLogger("Netcdf4Exporter")
 
 
+    def check_compression(self, path, variable_names):
+        """
+        Check that the requested compression was applied to variables in an exported file
+
+        Args:
+            path: the path of the exported netcdf4 file
+            variable_names: the names of the variables that should be compressed
+
+        Raises:
+            Exception if any of the variables was written without the requested compression filter
+        """
+        if not COMPRESSION_ENCODINGS[self.compression].get('zlib'):
+            return
+        with netCDF4.Dataset(path) as ds:
+            for name in variable_names:
+                filters = ds.variables[name].filters() or {}
+                if not filters.get('zlib'):
+                    raise Exception("Variable %s in %s was not written with %s compression" % (name, path, self.compression))
+
+    def check_bands(self, path, band_infos):
+        """
+        Check that the exported bands are georeferenced, and quantized if requested
+
+        Args:
+            path: the path of the exported netcdf4 file
+            band_infos: list of BandInfo objects describing the exported bands
+
+        Raises:
+            Exception if a band has no grid_mapping, or a floating point band was not quantized as requested
+        """
+        with netCDF4.Dataset(path) as ds:
+            for info in band_infos:
+                variable = ds.variables[info.name]
+                if 'grid_mapping' not in variable.ncattrs():
+                    raise Exception("Variable %s in %s was written without a grid_mapping" % (info.name, path))
+                if self.least_significant_digit is not None and not info.is_integer \
+                        and 'least_significant_digit' not in variable.ncattrs():
+                    raise Exception("Variable %s in %s was not quantized" % (info.name, path))
+
     def export(self, input_path, dataset, bands, to_path, history="", add_latlon=True, geo_type='float32'):
         """
         Export an imported scene
@@ -74,108 +141,121 @@ class Netcdf4Exporter:
             add_latlon: calculate and store per-pixel latitude longitude values
             geo_type: storage type for geolocation (x/y and lat/lon coordinates)
         """
+        # timezone aware so that date_created carries its UTC offset
+        now = datetime.datetime.now().astimezone()
+
         dataset = dataset.expand_dims('time')
         dataset = dataset.rio.write_coordinate_system()
 
-        dataset.x.encoding['dtype'] = geo_type
-        dataset.y.encoding['dtype'] = geo_type
+        ecomp = COMPRESSION_ENCODINGS[self.compression]
 
-        ecomp = {'zlib': True, 'complevel': 5}
+        # encodings for all exported variables, keyed by output variable name, passed to to_netcdf in one go
+        encodings = {
+            'x': {'dtype': geo_type},
+            'y': {'dtype': geo_type},
+            'time': {'dtype': 'int32', 'units': 'seconds since 1978-01-01'}
+        }
 
         # Calculate pixel longitude, latitudes.
         # Do this after the scene has been clipped.
         if add_latlon:
             self.logger.info("Computing lat/lon mapping")
-            transformer = Transformer.from_crs(dataset.spatial_ref.projected_crs_name, "EPSG:4326")
-            lat, lon = transformer.transform(*np.meshgrid(dataset.x, dataset.y))
+            lat, lon = latlon_grid(dataset.x.values, dataset.y.values, dataset.spatial_ref.projected_crs_name,
+                                   dtype=geo_type)
             dataset['lat'] = ('y', 'x'), lat, {'standard_name':'latitude',  'units':'degrees_north'}
-            dataset.lat.encoding.update(ecomp, dtype=geo_type)
+            encodings['lat'] = {**ecomp, 'dtype': geo_type, 'chunksizes': chunk_shape(dataset.lat)}
             dataset['lon'] = ('y', 'x'), lon, {'standard_name':'longitude', 'units':'degrees_east'}
-            dataset.lon.encoding.update(ecomp, dtype=geo_type)
+            encodings['lon'] = {**ecomp, 'dtype': geo_type, 'chunksizes': chunk_shape(dataset.lon)}
 
         self.logger.info("Starting Netcdf4 Export")
-        dataset.attrs['title'] = self.landsat_metadata.title
-        dataset.attrs['summary'] = self.landsat_metadata.summary
-        dataset.attrs['Conventions'] = 'CF-1.11, ACDD-1.3'
-        dataset.attrs["history"] = history
-
-        dataset.attrs['level1_software_version'] = self.landsat_metadata.software_l1
-        if hasattr(self.landsat_metadata, 'software_l2'):
-            dataset.attrs['level2_software_version'] = self.landsat_metadata.software_l2
-        dataset.attrs['landsat_importer_version'] = LANDSAT_IMPORTER_VERSION
-        dataset.attrs['netcdf_version_id'] = netCDF4.getlibversion()
-
-        dataset.attrs["date_created"] = date_format(datetime.datetime.now())
 
         acquistion_dt = self.landsat_metadata.get_acquisition_timestamp()
-        dataset.attrs['acquisition_time'] = date_format(acquistion_dt)
-        dataset.attrs['time_coverage_start'] = date_format(acquistion_dt-datetime.timedelta(seconds=12))
-        dataset.attrs['time_coverage_end'] = date_format(acquistion_dt+datetime.timedelta(seconds=12))
-
-        dataset.attrs['source_file'] = os.path.split(input_path)[-1]
-        dataset.attrs['source'] = self.landsat_metadata.get_id()
-
-        dataset.attrs['platform'] = self.landsat_metadata.get_spacecraft_id()
-        dataset.attrs["sensor"] = dataset.attrs["instrument"] = self.landsat_metadata.get_sensor_id()
-        dataset.attrs['metadata_link'] = self.landsat_metadata.doi
-        dataset.attrs['references'] = self.landsat_metadata.doi
 
         # Get the bounding box. Note this includes the pixel edges, so will be half
         # a pixel larger than the outermost lat/lon positions
-        min_lon, min_lat, max_lon, max_lat = dataset.rio.transform_bounds('EPSG:4326')
-        dataset.attrs["geospatial_lat_min"] = min_lat
-        dataset.attrs["geospatial_lon_min"] = min_lon
-        dataset.attrs["geospatial_lat_max"] = max_lat
-        dataset.attrs["geospatial_lon_max"] = max_lon
-        dataset.attrs["geospatial_lat_units"] = "degrees_north"
-        dataset.attrs["geospatial_lon_units"] = "degrees_east"
+        # reuse the cached transformer rather than have rioxarray build another one (densified as rioxarray does)
+        transformer = cached_transformer(dataset.spatial_ref.projected_crs_name, "EPSG:4326")
+        min_lon, min_lat, max_lon, max_lat = transformer.transform_bounds(*dataset.rio.bounds(), densify_pts=21)
 
         # rio.resolution maybe negative depending on direction of coordinate grid
         res = [round(abs(i)) for i in dataset.rio.resolution()]
-        dataset.attrs["geospatial_lat_resolution"] = f'{res[1]} {dataset.y.units}'
-        dataset.attrs["geospatial_lon_resolution"] = f'{res[0]} {dataset.x.units}'
-        # dataset.attrs["spatial_resolution"] = "%d m" % round((resolution_m_lat + resolution_m_lon) * 0.5)
-
-        dataset.attrs['processing_level'] = str(self.landsat_metadata.get_processing_level())
-        dataset.attrs['collection'] = np.int32(self.landsat_metadata.collection)
-        dataset.attrs["cdm_data_type"] = "grid"
-
-        dataset.attrs["acknowledgement"] = "Image courtesy of the U.S. Geological Survey"
-
-        username = "?"
-        try:
-            username = getpass.getuser()
-        except:
-            pass
-
-        dataset.attrs["creator_name"] = username
-
-        for (key,value) in self.inject_metadata.items():
-            dataset.attrs[key] = value
-
 
-
-        for band in bands:
-            if add_latlon:
-                dataset[band].attrs['coordinates'] = 'lon lat'
-
-            if self.landsat_metadata.is_integer(band):
-                dataset[band].encoding.update({'dtype': 'int32', "_FillValue": -999})
-            else:
-                dataset[band].encoding.update({'dtype':'float32'})
-
-            dataset[band].encoding.update(ecomp)
-
-        # Rename variables to use common netCDF names
-        nmap = {b:self.landsat_metadata.get_name(b) for b in bands}
-        dataset = dataset.rename(nmap)
-
-        dataset["time"] = xr.DataArray(data=np.array([self.landsat_metadata.get_acquisition_timestamp()],dtype='datetime64[ns]'), dims=('time'),
+        global_attrs = {
+            'title': self.landsat_metadata.title,
+            'summary': self.landsat_metadata.summary,
+            'Conventions': 'CF-1.11, ACDD-1.3',
+            'history': history,
+            'level1_software_version': self.landsat_metadata.software_l1
+        }
+        if hasattr(self.landsat_metadata, 'software_l2'):
+            global_attrs['level2_software_version'] = self.landsat_metadata.software_l2
+        global_attrs.update({
+            'landsat_importer_version': LANDSAT_IMPORTER_VERSION,
+            'netcdf_version_id': netCDF4.getlibversion(),
+            'date_created': date_format(now),
+            'acquisition_time': date_format(acquistion_dt),
+            'time_coverage_start': date_format(acquistion_dt-datetime.timedelta(seconds=12)),
+            'time_coverage_end': date_format(acquistion_dt+datetime.timedelta(seconds=12)),
+            'source_file': os.path.split(input_path)[-1],
+            'source': self.landsat_metadata.get_id(),
+            'platform': self.landsat_metadata.get_spacecraft_id(),
+            'sensor': self.landsat_metadata.get_sensor_id(),
+            'instrument': self.landsat_metadata.get_sensor_id(),
+            'metadata_link': self.landsat_metadata.doi,
+            'references': self.landsat_metadata.doi,
+            'geospatial_lat_min': min_lat,
+            'geospatial_lon_min': min_lon,
+            'geospatial_lat_max': max_lat,
+            'geospatial_lon_max': max_lon,
+            'geospatial_lat_units': "degrees_north",
+            'geospatial_lon_units': "degrees_east",
+            'geospatial_lat_resolution': f'{res[1]} {dataset.y.units}',
+            'geospatial_lon_resolution': f'{res[0]} {dataset.x.units}',
+            # 'spatial_resolution': "%d m" % round((resolution_m_lat + resolution_m_lon) * 0.5),
+            'processing_level': str(self.landsat_metadata.get_processing_level()),
+            'collection': np.int32(self.landsat_metadata.collection),
+            'cdm_data_type': "grid",
+            'acknowledgement': "Image courtesy of the U.S. Geological Survey",
+            'creator_name': USERNAME,
+            **self.inject_metadata
+        })
+        dataset.attrs.update(global_attrs)
+
+        # all bands share the same (time, y, x) grid, so the same encoding applies to every integer or float band
+        band_chunks = chunk_shape(dataset[bands[0]]) if bands else None
+        int_encoding = {'dtype': 'int32', "_FillValue": INTEGER_FILL_VALUE, **ecomp, 'chunksizes': band_chunks}
+        float_encoding = {'dtype': 'float32', **ecomp, 'chunksizes': band_chunks}
+        if self.least_significant_digit is not None:
+            float_encoding['least_significant_digit'] = self.least_significant_digit
+
+        band_infos = self.landsat_metadata.get_band_info_bulk(bands)
+
+        # the same attributes are added to every band
+        band_attrs = {'coordinates': 'lon lat'} if add_latlon else {}
+
+        for info in band_infos:
+            band = dataset[info.band]
+            band.attrs.update(band_attrs)
+
+            # the encodings passed to to_netcdf replace each band's own encoding, which is where rioxarray
+            # stores grid_mapping, so carry it over as an attribute to keep the band georeferenced
+            # (the netCDF4 backend rejects grid_mapping as an encoding parameter)
+            grid_mapping = band.encoding.get('grid_mapping', band.attrs.get('grid_mapping'))
+            if grid_mapping:
+                band.attrs['grid_mapping'] = grid_mapping
+
+            encodings[info.name] = dict(int_encoding if info.is_integer else float_encoding)
+
+        dataset["time"] = xr.DataArray(data=np.array([acquistion_dt],dtype='datetime64[ns]'), dims=('time'),
                                       attrs={"standard_name": "time", "long_name":"reference time of observations"})
-        dataset.time.encoding.update(dtype='int32', units='seconds since 1978-01-01')
 
+        # Rename variables to use common netCDF names
+        nmap = {info.band:info.name for info in band_infos}
+        dataset.rename(nmap).to_netcdf(to_path, encoding=encodings)
 
-        dataset.to_netcdf(to_path)
+        compressed = [info.name for info in band_infos] + (['lat', 'lon'] if add_latlon else [])
+        self.check_compression(to_path, compressed)
+        self.check_bands(to_path, band_infos)
         self.logger.info("Netcdf4 Export complete to %s" % to_path)
 
 
@@ -17,24 +17,29 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 """Main subroutine for processing landsat data, API entrypoint"""
+import concurrent.futures
 import enum
 
 import xarray
 
 from .oli_formats import OLIFormats
+from .band_kinds import BandKinds
 from .landsat_metadata_factory import LandsatMetadataFactory
 
 from landsat_importer import VERSION
 from landsat_importer.tiff_importer import TiffImporter
 from landsat_importer.netcdf4_exporter import Netcdf4Exporter
+from landsat_importer.concurrency import available_cpus
 
 import numpy as np
 import os
 import json
-import gc
 import time
 import logging
 
+# translation table used to convert QA flag meanings into CF flag_meanings tokens
+SPACE_TO_UNDERSCORE = str.maketrans({' ': '_'})
+
 class Processor:
     """
     The main class for coordinating the regridding of a single landsat scene
@@ -46,6 +51,9 @@ class Processor:
     # the number of m per degree of latitude
     M_PER_DEGREE_LATLON = 111111
 
+    # the maximum number of bands processed concurrently (each band in flight holds several full size arrays)
+    MAX_BAND_WORKERS = 4
+
 
 
     def __init__(self, input_path,
@@ -76,6 +84,10 @@ class Processor:
 
         self.logger.info("Read metadata: "+str(self.landsat_metadata))
 
+        # describe each band of the scene once, rather than querying the metadata for every band processed
+        self.band_infos = {info.band: info for info in
+                           self.landsat_metadata.get_band_info_bulk(self.landsat_metadata.get_bands())}
+
         self.dataset = None
         self.min_lon = self.max_lon = self.min_lat = self.max_lat = None
 
@@ -123,56 +135,59 @@ class Processor:
 
         self.logger.info("Acquired at " + str(self.landsat_metadata.get_acquisition_timestamp()))
 
-        layers = {}
-        for band in self.target_bands:
-            gc.collect()
-            self.logger.info(f"Processing band {band}")
-
-            # get the data imported from TIFF format
-            band_data, encoding = self.importer.import_tiff(band, self.band_paths[band],
-                                             self.landsat_metadata.is_integer(band))
-
-            # decode pixel values according to the encoding parameters stored in the
-            # landsat metadata
-            processed_band_data = self.preprocess_band(self.landsat_metadata, band, band_data)
-
-            long_name = self.landsat_metadata.get_long_name(band)
-            standard_name = self.landsat_metadata.get_standard_name(band)
-            units = self.landsat_metadata.get_units(band)
-            comment = self.landsat_metadata.get_comment(band)
-            if long_name:
-                processed_band_data.attrs["long_name"] = long_name
-
-            if standard_name:
-                processed_band_data.attrs["standard_name"] = standard_name
-
-            if units:
-                processed_band_data.attrs["units"] = units
-
-            if comment:
-                processed_band_data.attrs["comment"] = comment
-
-            if band == self.landsat_metadata.get_qa_band():
-                # Remove some incorrect attributes
-                for attr in ['AREA_OR_POINT', 'scale_factor', 'add_offset', 'units']:
-                    if attr in processed_band_data.attrs:
-                        del processed_band_data.attrs[attr]
-                (flag_masks, flag_values, flag_meanings) = self.landsat_metadata.get_qa_flag_metadata()
-                flag_type = processed_band_data.dtype
-                processed_band_data.attrs["flag_values"] = np.array(flag_values, flag_type)
-                processed_band_data.attrs["flag_masks"] = np.array(flag_masks, flag_type)
-                # Convert flag meanings into valid CF attribute
-                processed_band_data.attrs["flag_meanings"] = ' '.join(s.replace(' ', '_') for s in flag_meanings)
-
-            layers[band] = processed_band_data
-            layers[band].encoding = encoding
+        # bands are independent, import and decode them concurrently
+        # (GDAL reads and numpy arithmetic release the GIL, and each band's file is read without a shared lock)
+        workers = max(1, min(len(self.target_bands), available_cpus(), Processor.MAX_BAND_WORKERS))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            # map returns results in the order of target_bands
+            layers = dict(zip(self.target_bands, executor.map(self.process_band, self.target_bands)))
 
         # Combine all the bands into a single dataset
         self.dataset = xarray.Dataset(layers)
         end_time = time.time()
         return end_time - start_time
 
-    def preprocess_band(self,landsat_metadata, band, data):
+    def process_band(self, band):
+        """
+        Import and decode a single band from the scene
+
+        Args:
+            band: the name of the band
+
+        Returns:
+            an xarray.DataArray containing the decoded band
+        """
+        self.logger.info(f"Processing band {band}")
+
+        # get the data imported from TIFF format
+        info = self.band_infos[band]
+        band_data, encoding = self.importer.import_tiff(band, self.band_paths[band], info.is_integer)
+
+        # decode pixel values according to the encoding parameters stored in the
+        # landsat metadata
+        processed_band_data = self.preprocess_band(self.landsat_metadata, band, band_data, kind=info.kind)
+
+        band_attrs = {"long_name": info.long_name, "standard_name": info.standard_name,
+                      "units": info.units, "comment": info.comment}
+        attrs = {k: v for (k, v) in band_attrs.items() if v}
+
+        if band == self.landsat_metadata.get_qa_band():
+            # Remove some incorrect attributes
+            for attr in ['AREA_OR_POINT', 'scale_factor', 'add_offset', 'units']:
+                processed_band_data.attrs.pop(attr, None)
+                attrs.pop(attr, None)
+            (flag_masks, flag_values, flag_meanings) = self.landsat_metadata.get_qa_flag_metadata()
+            flag_type = processed_band_data.dtype
+            attrs["flag_values"] = np.array(flag_values, flag_type)
+            attrs["flag_masks"] = np.array(flag_masks, flag_type)
+            # Convert flag meanings into valid CF attribute
+            attrs["flag_meanings"] = ' '.join(s.translate(SPACE_TO_UNDERSCORE) for s in flag_meanings)
+
+        processed_band_data.attrs.update(attrs)
+        processed_band_data.encoding = encoding
+        return processed_band_data
+
+    def preprocess_band(self,landsat_metadata, band, data, kind=None):
         """
         preprocess a particular band to extract pixel values from the landsat encoding
 
@@ -180,36 +195,38 @@ class Processor:
             landsat_metadata: a LandsatMetadata object
             band: the name of the band
             data: a numpy array containing the band's data imported from the landsat scene
+            kind: the band's BandKinds value, if already known
 
         Returns:
 
         """
-        if landsat_metadata.is_level2(band):
+        if kind is None:
+            kind = landsat_metadata.get_band_kind(band)
+        if kind is BandKinds.OTHER:
+            # passthrough, nothing to decode
+            return data
+        elif kind is BandKinds.LEVEL2:
             add = landsat_metadata.get_level2_shift(band)
             mult = landsat_metadata.get_level2_scale(band)
             return TiffImporter.decode(data, mult, add, None)
-        else:
-            if landsat_metadata.is_reflectance(band) or landsat_metadata.is_corrected_reflectance(band):
-                A_rho, M_rho, sun_elevation = landsat_metadata.get_reflectance_correction(band)
-                refl = TiffImporter.DN_to_refl(data, M_rho, A_rho)
-                if landsat_metadata.is_corrected_reflectance(band):
-                    return TiffImporter.reflectance_corrected(refl, sun_elevation)
-                else:
-                    return refl
-            elif landsat_metadata.is_bt(band) or landsat_metadata.is_radiance(band):
-                AL, ML = landsat_metadata.get_radiance_correction(band)
-                rad = TiffImporter.DN_to_radiance(data, ML, AL)
-                if landsat_metadata.is_bt(band):
-                    K1, K2 = landsat_metadata.get_bt_correction(band)
-                    return TiffImporter.Radiance_to_satBT(rad, K1, K2)
-                else:
-                    return rad
-            elif landsat_metadata.is_angle(band):
-                ML = landsat_metadata.get_angle_correction()
-                return TiffImporter.Angle_to_Degrees(data, ML)
+        elif kind is BandKinds.REFLECTANCE or kind is BandKinds.CORRECTED_REFLECTANCE:
+            A_rho, M_rho, sun_elevation = landsat_metadata.get_reflectance_correction(band)
+            if kind is BandKinds.CORRECTED_REFLECTANCE:
+                return TiffImporter.DN_to_corrected_refl(data, M_rho, A_rho, sun_elevation)
+            else:
+                return TiffImporter.DN_to_refl(data, M_rho, A_rho)
+        elif kind is BandKinds.BT or kind is BandKinds.RADIANCE:
+            AL, ML = landsat_metadata.get_radiance_correction(band)
+            if kind is BandKinds.BT:
+                K1, K2 = landsat_metadata.get_bt_correction(band)
+                return TiffImporter.DN_to_satBT(data, ML, AL, K1, K2)
             else:
-                # do nothing
-                return data
+                return TiffImporter.DN_to_radiance(data, ML, AL)
+        elif kind is BandKinds.ANGLE:
+            ML = landsat_metadata.get_angle_correction()
+            return TiffImporter.Angle_to_Degrees(data, ML)
+        else:
+            raise Exception("Unsupported band kind %s for band %s" % (kind, band))
 
     def get_output_filename(self, pattern):
         """
@@ -251,7 +268,8 @@ class Processor:
         return self.landsat_metadata
 
     def export(self, output_path, include_angles=False, history="",
-               min_lat=None, min_lon=None, max_lat=None, max_lon=None, inject_metadata={}):
+               min_lat=None, min_lon=None, max_lat=None, max_lon=None, inject_metadata={}, compression="zlib",
+               least_significant_digit=None):
         """
         Export the regridded scene
 
@@ -264,10 +282,13 @@ class Processor:
             max_lat: clip exported data to bounding box
             max_lon: clip exported data to bounding box
             inject_metadata: dictionary to supply global metadata to add to exported file
+            compression: compression applied to the exported variables, see netcdf4_exporter.COMPRESSION_ENCODINGS
+            least_significant_digit: if not None, quantize floating point bands to this many decimal places
         """
         self.logger.info("Exporting output grid to file %s" % output_path)
 
-        exporter = Netcdf4Exporter(self.get_landsat_metadata(),inject_metadata)
+        exporter = Netcdf4Exporter(self.get_landsat_metadata(),inject_metadata,compression=compression,
+                                   least_significant_digit=least_significant_digit)
 
         shrink = False
         if min_lat is None:
@@ -23,8 +23,11 @@ import numpy as np
 import math
 import rioxarray
 import xarray as xr
-from pyproj import Transformer
 
+from landsat_importer.geolocation import latlon_grid
+
+# the fill value used for integer bands, declared as their _FillValue when exported
+INTEGER_FILL_VALUE = -999
 
 class TiffImporter:
 
@@ -32,34 +35,58 @@ class TiffImporter:
         self.logger = logging.getLogger("tiff_import")
 
     def latlon_image(self, path):
-        da = rioxarray.open_rasterio(path)
-
-        ny, nx = len(da['y']), len(da['x'])
-        x, y = np.meshgrid(da['x'], da['y'])
-        print(da.spatial_ref.projected_crs_name)
+        """
+        Compute the latitude and longitude of each pixel of a TIFF file
 
-        transformer = Transformer.from_crs(da.spatial_ref.projected_crs_name, "EPSG:4326")
-        lat, lon = transformer.transform(x.flatten(), y.flatten())
-        lon = np.asarray(lon).reshape((ny, nx))
-        lat = np.asarray(lat).reshape((ny, nx))
+        Args:
+            path: the path to the TIFF file
 
-        return lat, lon
+        Returns:
+            an xarray.Dataset with float32 lat and lon variables on the file's (y, x) grid
+        """
+        # only the coordinates are needed, close the file rather than leave it to the garbage collector
+        with rioxarray.open_rasterio(path) as da:
+            x = da['x'].load()
+            y = da['y'].load()
+            crs_name = da.spatial_ref.projected_crs_name
+        self.logger.debug("projected_crs_name=%s", crs_name)
+        lat, lon = latlon_grid(x.values, y.values, crs_name, dtype=np.float32)
+        return xr.Dataset({
+            'lat': (('y', 'x'), lat, {'standard_name': 'latitude', 'units': 'degrees_north'}),
+            'lon': (('y', 'x'), lon, {'standard_name': 'longitude', 'units': 'degrees_east'})
+        }, coords={'y': y, 'x': x})
 
     def import_tiff(self, band, path, is_int):
         """
         Open the TIFF file and store in an array.
         """
-        da = rioxarray.open_rasterio(path).squeeze(drop=True)
-        encoding = da.encoding
-        if band == "8":
-            da = da[::2, ::2]
-
-        if '_FillValue' in da.attrs:
-            da = da.where(da != da._FillValue)
-        elif is_int:
+        # read the pixels while the file is open and then close it, rather than leave the GDAL dataset
+        # (and its file handle) open until the garbage collector gets to it
+        # each band opens its own file, so there is no shared handle to protect with rioxarray's global lock,
+        # which would otherwise serialise the reads of bands imported concurrently
+        with rioxarray.open_rasterio(path, lock=False) as src:
+            da = src.squeeze(drop=True)
+            encoding = dict(da.encoding)
+            if band == "8":
+                da = da[::2, ::2]
+            da = da.load()
+
+        if is_int and '_FillValue' in da.attrs:
+            # keep integer (flag) bands integer, replacing the source fill value with the exported one
+            fill_mask = da.values == da._FillValue
             da = da.astype(np.int32)
-        else:
+            da.values[fill_mask] = INTEGER_FILL_VALUE
+            del da.attrs['_FillValue']
+        elif '_FillValue' in da.attrs:
+            # mask fill pixels in place in a float32 copy, rather than let where() build a mask, a float64 result
+            # and its temporaries (float32 represents the 16 bit landsat values exactly)
+            fill_mask = da.values == da._FillValue
             da = da.astype(np.float32)
+            da.values[fill_mask] = np.nan
+        elif is_int:
+            da = da.astype(np.int32, copy=False)
+        else:
+            da = da.astype(np.float32, copy=False)
 
         return da, encoding
 
@@ -77,7 +104,9 @@ class TiffImporter:
 
         # M_ro = 2.0E-05
         # A_ro = -0.1
-        return (image_data * M_ro) + A_ro
+        refl = image_data * M_ro
+        refl += A_ro
+        return refl
 
     @staticmethod
     def reflectance_corrected(refl, sun_elev_angle):
@@ -89,10 +118,22 @@ class TiffImporter:
         See section 5 of https://www.usgs.gov/media/files/landsat-8-data-users-handbook
         """
         sun_zenith_angle = 90. - sun_elev_angle
-        Reflectance_corr = refl / (math.cos(math.radians(sun_zenith_angle)))
+        Reflectance_corr = refl * (1.0 / math.cos(math.radians(sun_zenith_angle)))
 
         return Reflectance_corr
 
+    @staticmethod
+    def DN_to_corrected_refl(image_data, M_ro, A_ro, sun_elev_angle):
+        """
+        Convert the DN to TOA Reflectance corrected for Sun angle, equivalent to
+        reflectance_corrected(DN_to_refl(image_data, M_ro, A_ro), sun_elev_angle)
+
+        The sun angle correction is folded into the rescaling factors so that the result is
+        computed with a single multiply and add
+        """
+        inv_cos = 1.0 / math.cos(math.radians(90. - sun_elev_angle))
+        return TiffImporter.DN_to_refl(image_data, M_ro * inv_cos, A_ro * inv_cos)
+
     @staticmethod
     def DN_to_radiance(image_data, ML, AL):
         """
@@ -130,10 +171,28 @@ class TiffImporter:
         See section 5 of https://www.usgs.gov/media/files/landsat-8-data-users-handbook
         """
 
+        # BT = K2 / ln(K1/L + 1), evaluated in a single buffer after the first division
         satBT = K1 / Radiance
-        satBT += 1.0
-        satBT = np.log(satBT)
-        satBT = K2 / satBT
+        values = satBT.data if isinstance(satBT, xr.DataArray) else satBT
+        np.log1p(values, out=values)
+        np.divide(K2, values, out=values)
+
+        return satBT
+
+    @staticmethod
+    def DN_to_satBT(image_data, ML, AL, K1, K2):
+        """
+        Convert the DN to At-Satellite Brightness Temperature, equivalent to
+        Radiance_to_satBT(DN_to_radiance(image_data, ML, AL), K1, K2)
+
+        All steps after the first multiply are evaluated in place in a single buffer
+        """
+        satBT = image_data * ML
+        values = satBT.data if isinstance(satBT, xr.DataArray) else satBT
+        values += AL
+        np.divide(K1, values, out=values)
+        np.log1p(values, out=values)
+        np.divide(K2, values, out=values)
 
         return satBT
 
@@ -153,13 +212,24 @@ class TiffImporter:
         """
         Decode L2 surface_temperature etc
         """
+        decoded = image_data * M
+        decoded += A
         if FILL is not None:
-            return np.where(image_data == FILL, np.nan, (image_data * M) + A)
-        else:
-            return (image_data * M) + A
+            # mask in place, keeping decoded as a DataArray (with coordinates) where image_data is one
+            values = decoded.data if isinstance(decoded, xr.DataArray) else decoded
+            values[np.asarray(image_data) == FILL] = np.nan
+        return decoded
 
 if __name__ == '__main__':
+    # write the lat/lon grid of a TIFF file, usage: python -m landsat_importer.tiff_importer <tiff_path> <netcdf4_path>
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tiff_path", help="path to a landsat scene TIFF file")
+    parser.add_argument("output_path", help="path to write the lat/lon grid to, in netcdf4 format")
+    args = parser.parse_args()
     ti = TiffImporter()
-    r = ti.latlon_image("/home/dev/github/landsat2nc/EE/LANDSAT_8_C1/LC80080132019127LGN00/LC08_L1TP_008013_20190507_20190521_01_T1_B4.TIF")
+    r = ti.latlon_image(args.tiff_path)
     print(r)
-    r.to_netcdf("nc.nc")
\ No newline at end of file
+    encoding = {v: {'zlib': True, 'complevel': 1, 'chunksizes': tuple(min(512, n) for n in r[v].shape)}
+                for v in ['lat', 'lon']}
+    r.to_netcdf(args.output_path, encoding=encoding)
\ No newline at end of file